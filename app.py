@@ -1,4 +1,5 @@
 import os
+import multiprocessing
 import tkinter as tk
 from ui.wizard import ProposalWizard
 from dotenv import load_dotenv
@@ -13,4 +14,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Spawned extraction workers re-run this module; in a frozen build they must not open the GUI
+    multiprocessing.freeze_support()
     main()
@@ -1,14 +1,28 @@
 # Services package initialization
-from .llm_providers import DeepSeekClient, SonnetClient, LLMResult
-from .document_processor import DocumentProcessor
-from .token_manager import TokenManager, ChainedPromptGenerator, TokenLimits
+#
+# Exports are resolved lazily (PEP 562) so importing one light submodule,
+# e.g. services.token_manager, does not pull in the PDF/DOCX/XLSX and HTTP
+# libraries used by the others.
+import importlib
 
-__all__ = [
-    'DeepSeekClient', 
-    'SonnetClient', 
-    'LLMResult',
-    'DocumentProcessor',
-    'TokenManager', 
-    'ChainedPromptGenerator', 
-    'TokenLimits'
-]
\ No newline at end of file
+_EXPORTS = {
+    'DeepSeekClient': '.llm_providers',
+    'SonnetClient': '.llm_providers',
+    'LLMResult': '.llm_providers',
+    'DocumentProcessor': '.document_processor',
+    'TokenManager': '.token_manager',
+    'ChainedPromptGenerator': '.token_manager',
+    'TokenLimits': '.token_manager',
+    'GenerationAborted': '.token_manager',
+    'LLMCache': '.llm_cache',
+    'DaemonThreadExecutor': '.daemon_executor'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
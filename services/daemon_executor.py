@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import Executor, Future
+from typing import Optional
+
+class DaemonThreadExecutor(Executor):
+    """Executor running each call on its own daemon thread, at most max_workers at once
+
+    ThreadPoolExecutor workers, and so asyncio.to_thread, are joined at interpreter
+    exit: closing the window would keep the process alive until every call in flight
+    returned, e.g. a provider request up to its read timeout. Daemon threads are not
+    joined, so the app exits as soon as its window is closed. Use it only for calls
+    whose result is worthless once the app is gone.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._slots = threading.BoundedSemaphore(max_workers) if max_workers else None
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        threading.Thread(target=self._run, args=(future, fn, args, kwargs), daemon=True).start()
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _run(self, future, fn, args, kwargs):
+        if self._slots:
+            self._slots.acquire()
+        try:
+            if not future.set_running_or_notify_cancel():
+                return  # Cancelled while waiting for a slot
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        finally:
+            if self._slots:
+                self._slots.release()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            self._shutdown = True
+            futures = list(self._futures)
+        if cancel_futures:
+            for future in futures:
+                future.cancel()  # Only calls still waiting for a slot are cancelled
+        if wait:
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()  # Blocks until the call has finished
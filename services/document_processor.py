@@ -1,17 +1,34 @@
 import os
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
-import pypdf
-from docx import Document
-from pdfminer.high_level import extract_text
-from docxtpl import DocxTemplate
-import openpyxl
-from openpyxl.styles import Font, Alignment
 import json
 
+# The PDF, DOCX and XLSX libraries are imported on first use: each pulls in a
+# large dependency tree (lxml, pdfminer) that only some operations need.
+
+@lru_cache(maxsize=None)
+def _header_styles():
+    """Shared (font, alignment) for workbook headers, built once (openpyxl styles are immutable)"""
+    from openpyxl.styles import Font, Alignment
+    return Font(bold=True), Alignment(horizontal='center')
+
 class DocumentProcessor:
     """Handles document processing for ToR extraction and template generation"""
     
+    @staticmethod
+    def file_hash(file_path: str) -> Optional[str]:
+        """Return a content fingerprint of a file, read in 64 KB blocks"""
+        if not file_path or not os.path.exists(file_path):
+            return None
+        
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
     @staticmethod
     def extract_text_from_file(file_path: str) -> Optional[str]:
         """Extract text from PDF or DOCX file"""
@@ -36,6 +53,7 @@ class DocumentProcessor:
         """Extract text from PDF using pdfminer"""
         try:
             # First try with pdfminer
+            from pdfminer.high_level import extract_text
             text = extract_text(str(file_path))
             if text.strip():
                 return text.strip()
@@ -44,6 +62,7 @@ class DocumentProcessor:
         
         try:
             # Fallback to pypdf
+            import pypdf
             reader = pypdf.PdfReader(str(file_path))
             text = ""
             for page in reader.pages:
@@ -56,6 +75,7 @@ class DocumentProcessor:
     def _extract_from_docx(file_path: Path) -> str:
         """Extract text from DOCX"""
         try:
+            from docx import Document
             doc = Document(str(file_path))
             text = []
             for paragraph in doc.paragraphs:
@@ -73,8 +93,14 @@ class DocumentProcessor:
                 # Create a basic template if none provided
                 return DocumentProcessor._create_basic_docx(output_path, context)
             
+            from docxtpl import DocxTemplate
+            
+            # Templates can loop over {% for p in narrative_paragraphs %} for one paragraph per block
             doc = DocxTemplate(template_path)
-            doc.render(context)
+            doc.render({
+                **context,
+                "narrative_paragraphs": DocumentProcessor._split_paragraphs(context.get('narrative', ''))
+            })
             doc.save(output_path)
             return True
         except Exception as e:
@@ -82,10 +108,16 @@ class DocumentProcessor:
             # Fallback to basic template
             return DocumentProcessor._create_basic_docx(output_path, context)
     
+    @staticmethod
+    def _split_paragraphs(text: str) -> list:
+        """Split text into its non-empty, blank-line separated blocks"""
+        return [block.strip() for block in (text or '').split('\n\n') if block.strip()]
+    
     @staticmethod
     def _create_basic_docx(output_path: str, context: dict) -> bool:
         """Create a basic DOCX document without template"""
         try:
+            from docx import Document
             doc = Document()
             
             # Title
@@ -112,7 +144,8 @@ class DocumentProcessor:
             # Narrative content
             if context.get('narrative'):
                 doc.add_heading('Narrativa del Proyecto', level=1)
-                doc.add_paragraph(context.get('narrative', ''))
+                for paragraph in DocumentProcessor._split_paragraphs(context.get('narrative', '')):
+                    doc.add_paragraph(paragraph)
             
             doc.save(output_path)
             return True
@@ -124,9 +157,14 @@ class DocumentProcessor:
     def generate_excel_budget(output_path: str, budget_data: dict) -> bool:
         """Generate Excel budget from budget data"""
         try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Presupuesto"
+            import openpyxl
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.utils import get_column_letter
+            header_font, center_alignment = _header_styles()
+            
+            # Write-only mode streams rows to disk instead of keeping a cell graph
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Presupuesto")
             
             # Headers
             headers = [
@@ -135,17 +173,17 @@ class DocumentProcessor:
                 'Total', 'Justificación'
             ]
             
-            # Style headers
-            header_font = Font(bold=True)
-            center_alignment = Alignment(horizontal='center')
+            def styled(value, **style):
+                cell = WriteOnlyCell(ws, value=value)
+                for name, attr in style.items():
+                    setattr(cell, name, attr)
+                return cell
             
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.alignment = center_alignment
+            # Rows are built first: column widths must be set before any row is written
+            rows = [[styled(header, font=header_font, alignment=center_alignment) for header in headers]]
+            widths = [len(header) for header in headers]
             
             # Add budget items
-            row = 2
             for item in budget_data.get('items', []):
                 total = item.get('qty', 0) * item.get('unit_cost', 0) * item.get('months', 1)
                 
@@ -162,38 +200,30 @@ class DocumentProcessor:
                     item.get('justification', '')
                 ]
                 
-                for col, value in enumerate(values, 1):
-                    ws.cell(row=row, column=col, value=value)
-                row += 1
+                rows.append(values)
+                for col, value in enumerate(values):
+                    widths[col] = max(widths[col], len(str(value)))
             
             # Add summary
             if budget_data.get('summary_by_category'):
-                row += 2
-                ws.cell(row=row, column=1, value="RESUMEN POR CATEGORÍA").font = header_font
-                row += 1
-                
+                rows += [[], [], [styled("RESUMEN POR CATEGORÍA", font=header_font)]]
+                widths[0] = max(widths[0], len("RESUMEN POR CATEGORÍA"))
                 for category, amount in budget_data.get('summary_by_category', {}).items():
-                    ws.cell(row=row, column=1, value=category)
-                    ws.cell(row=row, column=2, value=amount)
-                    row += 1
+                    rows.append([category, amount])
+                    widths[0] = max(widths[0], len(str(category)))
+                    widths[1] = max(widths[1], len(str(amount)))
             
             # Add total
-            row += 1
-            ws.cell(row=row, column=1, value="TOTAL").font = header_font
-            ws.cell(row=row, column=2, value=budget_data.get('total', 0)).font = header_font
+            total = budget_data.get('total', 0)
+            rows += [[], [styled("TOTAL", font=header_font), styled(total, font=header_font)]]
+            widths[1] = max(widths[1], len(str(total)))
             
             # Auto-adjust column widths
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+            for col, max_length in enumerate(widths, 1):
+                ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
+            
+            for row in rows:
+                ws.append(row)
             
             wb.save(output_path)
             return True
@@ -1,9 +1,29 @@
 import os
 import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from dataclasses import dataclass
 from typing import Any, Dict
 
+# (connect, read) timeouts: fail fast on unreachable hosts, but leave
+# generation requests enough time to complete
+REQUEST_TIMEOUT = (3.05, 60)
+
+# Shared session so repeated calls reuse the TLS connection to each API host
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=16))
+
+# Upper bound on provider requests in flight at any time, shared by every client
+# and thread (concurrent generations, parallel chunk extractions)
+MAX_CONCURRENT_REQUESTS = 5
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+def _post(url: str, **kwargs) -> requests.Response:
+    """POST through the shared session, waiting for a free request slot"""
+    with _request_slots:
+        return _session.post(url, **kwargs)
+
 @dataclass
 class LLMResult:
     content: str
@@ -37,11 +57,11 @@ class DeepSeekClient:
                 "max_tokens": self.max_tokens
             }
             
-            response = requests.post(
+            response = _post(
                 f"{self.base_url}/chat/completions",
                 headers=headers,
                 json=data,
-                timeout=60
+                timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -65,6 +85,18 @@ class DeepSeekClient:
                 raw={"error": str(e)}
             )
 
+def _empty_budget(error: str) -> Dict[str, Any]:
+    """Budget-shaped result carrying only an error, so callers can read the usual keys"""
+    return {
+        "error": error,
+        "currency": "USD",
+        "items": [],
+        "summary_by_category": {},
+        "total": 0.0,
+        "assumptions": [],
+        "compliance_notes": []
+    }
+
 class SonnetClient:
     def __init__(self, api_key: str, model: str = "claude-3-sonnet-20240229", temperature: float = 0.1, max_tokens: int = 2000):
         self.api_key = api_key
@@ -75,15 +107,7 @@ class SonnetClient:
 
     def generate_json(self, prompt: str, schema: dict) -> Dict[str, Any]:
         if not self.api_key:
-            return {
-                "error": "Sonnet API key no configurada. Por favor verifica tu archivo .env",
-                "currency": "USD",
-                "items": [],
-                "summary_by_category": {},
-                "total": 0.0,
-                "assumptions": [],
-                "compliance_notes": []
-            }
+            return _empty_budget("Sonnet API key no configurada. Por favor verifica tu archivo .env")
         
         try:
             headers = {
@@ -105,11 +129,11 @@ Asegúrate de que la respuesta sea un JSON válido y completo."""
                 "messages": [{"role": "user", "content": prompt}]
             }
             
-            response = requests.post(
+            response = _post(
                 f"{self.base_url}/messages",
                 headers=headers,
                 json=data,
-                timeout=60
+                timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -123,43 +147,11 @@ Asegúrate de que la respuesta sea un JSON válido y completo."""
                     json_content = content[json_start:json_end]
                     return json.loads(json_content)
                 except (json.JSONDecodeError, ValueError):
-                    return {
-                        "error": f"No se pudo parsear JSON de la respuesta: {content}",
-                        "currency": "USD",
-                        "items": [],
-                        "summary_by_category": {},
-                        "total": 0.0,
-                        "assumptions": [],
-                        "compliance_notes": []
-                    }
+                    return _empty_budget(f"No se pudo parsear JSON de la respuesta: {content}")
             else:
-                return {
-                    "error": f"Error API Sonnet: {response.status_code} - {response.text}",
-                    "currency": "USD",
-                    "items": [],
-                    "summary_by_category": {},
-                    "total": 0.0,
-                    "assumptions": [],
-                    "compliance_notes": []
-                }
+                return _empty_budget(f"Error API Sonnet: {response.status_code} - {response.text}")
                 
         except requests.exceptions.RequestException as e:
-            return {
-                "error": f"Error de conexión con Sonnet: {str(e)}",
-                "currency": "USD",
-                "items": [],
-                "summary_by_category": {},
-                "total": 0.0,
-                "assumptions": [],
-                "compliance_notes": []
-            }
+            return _empty_budget(f"Error de conexión con Sonnet: {str(e)}")
         except Exception as e:
-            return {
-                "error": f"Error inesperado: {str(e)}",
-                "currency": "USD",
-                "items": [],
-                "summary_by_category": {},
-                "total": 0.0,
-                "assumptions": [],
-                "compliance_notes": []
-            }
\ No newline at end of file
+            return _empty_budget(f"Error inesperado: {str(e)}")
\ No newline at end of file
@@ -2,6 +2,118 @@ import re
 import math
 from typing import List, Dict, Any
 from dataclasses import dataclass
+from services.daemon_executor import DaemonThreadExecutor
+
+# Upper bound on chunk extraction requests sent concurrently by one generator
+MAX_EXTRACTION_WORKERS = 4
+
+# Version of the prompt templates and schema below; bump it whenever they change
+# so responses cached for older prompts are no longer reused
+PROMPT_VERSION = 1
+
+# Prompt templates, parsed once and filled with str.format
+_EXTRACTION_PROMPT = """
+Analiza este fragmento de los términos de referencia y extrae la información clave:
+
+SECCIÓN: {section}
+CONTENIDO:
+{content}
+
+Extrae y resume:
+1. Objetivos mencionados
+2. Actividades requeridas  
+3. Entregables esperados
+4. Recursos necesarios
+5. Restricciones o condiciones
+6. Información presupuestal (si hay)
+
+Responde de forma concisa y estructurada.
+"""
+
+_NARRATIVE_PROMPT = """
+Basándote en la siguiente {content_type} y información del proyecto, genera una narrativa completa para una propuesta de proyecto en {language}.
+
+INFORMACIÓN DEL PROYECTO:
+- Título: {title}
+- País: {country}
+- Donante: {donor}
+- Duración: {duration_months} meses
+- Presupuesto máximo: {budget_cap}
+
+PERFIL DE LA ORGANIZACIÓN:
+{org_profile}
+
+{content_type_upper}:
+{content}
+
+Por favor genera una narrativa completa que incluya:
+1. Resumen ejecutivo
+2. Justificación del proyecto
+3. Objetivos y resultados esperados
+4. Metodología
+5. Plan de implementación
+6. Sostenibilidad
+7. Monitoreo y evaluación
+
+La narrativa debe ser profesional, convincente y alineada con los términos de referencia.
+"""
+
+_BUDGET_PROMPT = """
+Basándote en la siguiente {content_type} y la información del proyecto, genera un presupuesto detallado.
+
+INFORMACIÓN DEL PROYECTO:
+- Título: {title}
+- País: {country}
+- Duración: {duration_months} meses
+- Presupuesto máximo: {budget_cap}
+
+{content_type_upper}:
+{content}
+
+Genera un presupuesto detallado con categorías típicas como:
+- Personal (salarios, consultores)
+- Equipamiento y suministros
+- Viajes y transporte
+- Capacitación y eventos
+- Gastos operativos
+- Costos administrativos
+
+Asegúrate de que el presupuesto sea realista y esté dentro del tope especificado.
+"""
+
+# JSON schema the budget provider is asked to follow
+_BUDGET_SCHEMA = {
+    "currency": "USD",
+    "items": [
+        {
+            "code": "string",
+            "category": "string", 
+            "description": "string",
+            "unit": "string",
+            "qty": "number",
+            "unit_cost": "number",
+            "months": "number",
+            "phase": "string",
+            "justification": "string"
+        }
+    ],
+    "summary_by_category": {},
+    "total": "number",
+    "assumptions": ["string"],
+    "compliance_notes": ["string"]
+}
+
+def _project_fields(project_info: Dict) -> Dict[str, Any]:
+    """Project values substituted into the prompt templates"""
+    return {
+        'language': project_info.get('language', 'es'),
+        'title': project_info.get('title', ''),
+        'country': project_info.get('country', ''),
+        'donor': project_info.get('donor', ''),
+        'duration_months': project_info.get('duration_months', ''),
+        'budget_cap': project_info.get('budget_cap', 'No especificado'),
+        'org_profile': project_info.get('org_profile', '')
+    }
 
 @dataclass
 class TokenLimits:
@@ -156,13 +268,36 @@ class TokenManager:
         
         return chunks
 
+class GenerationAborted(Exception):
+    """Raised when a generation is cancelled by the user"""
+
 class ChainedPromptGenerator:
     """Handles chained prompts for large documents"""
     
-    def __init__(self, client, max_tokens_per_chunk: int):
+    def __init__(self, client, max_tokens_per_chunk: int, cancel_event=None):
         self.client = client
         self.max_tokens_per_chunk = max_tokens_per_chunk
+        self.cancel_event = cancel_event  # threading.Event checked between requests
         self.accumulated_context = ""
+        self.had_errors = False  # Set when any provider request failed, even if the output looks complete
+    
+    def _check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise GenerationAborted("Generación abortada por el usuario")
+    
+    def _generate(self, prompt: str):
+        """Text request to the client, recording provider errors"""
+        result = self.client.generate(prompt)
+        if "error" in result.raw:
+            self.had_errors = True
+        return result
+    
+    def _generate_json(self, prompt: str) -> Dict:
+        """JSON request to the client, recording provider errors"""
+        result = self.client.generate_json(prompt, self._get_budget_schema())
+        if result.get("error"):
+            self.had_errors = True
+        return result
     
     def process_tor_chunks(self, chunks: List[Dict[str, str]], project_info: Dict, task_type: str) -> str:
         """Process multiple ToR chunks and accumulate context"""
@@ -176,6 +311,7 @@ class ChainedPromptGenerator:
     
     def _generate_single_chunk(self, chunk: Dict[str, str], project_info: Dict, task_type: str) -> str:
         """Generate content for single chunk"""
+        self._check_cancelled()
         if task_type == "narrative":
             prompt = self._build_narrative_prompt(chunk["content"], project_info)
         else:
@@ -183,143 +319,76 @@ class ChainedPromptGenerator:
         
         try:
             if hasattr(self.client, 'generate'):
-                result = self.client.generate(prompt)
-                return result.content
+                return self._generate(prompt).content
             else:
-                schema = self._get_budget_schema()
-                return self.client.generate_json(prompt, schema)
+                return self._generate_json(prompt)
+        except GenerationAborted:
+            raise
         except Exception as e:
+            self.had_errors = True
             return f"Error en generación: {str(e)}"
     
+    def _extract_key_info(self, i: int, chunk: Dict[str, str], total: int) -> str:
+        """Summarise the key information of one ToR chunk"""
+        self._check_cancelled()
+        print(f"Processing chunk {i+1}/{total}: {chunk['section']}")
+        
+        extraction_prompt = _EXTRACTION_PROMPT.format(section=chunk['section'], content=chunk['content'])
+        
+        try:
+            if hasattr(self.client, 'generate'):
+                result = self._generate(extraction_prompt)
+                return f"SECCIÓN {chunk['section']}:\n{result.content}\n"
+            else:
+                # For budget client, still try to extract info
+                return f"SECCIÓN {chunk['section']}:\n{chunk['content'][:500]}...\n"
+        except Exception as e:
+            self.had_errors = True
+            return f"SECCIÓN {chunk['section']}: Error procesando - {str(e)}\n"
+    
     def _generate_chained(self, chunks: List[Dict[str, str]], project_info: Dict, task_type: str) -> str:
         """Generate content using chained prompts"""
         
-        # First pass: Extract key information from each chunk
-        key_info = []
-        for i, chunk in enumerate(chunks):
-            print(f"Processing chunk {i+1}/{len(chunks)}: {chunk['section']}")
-            
-            extraction_prompt = f"""
-Analiza este fragmento de los términos de referencia y extrae la información clave:
-
-SECCIÓN: {chunk['section']}
-CONTENIDO:
-{chunk['content']}
-
-Extrae y resume:
-1. Objetivos mencionados
-2. Actividades requeridas  
-3. Entregables esperados
-4. Recursos necesarios
-5. Restricciones o condiciones
-6. Información presupuestal (si hay)
-
-Responde de forma concisa y estructurada.
-"""
-            
-            try:
-                if hasattr(self.client, 'generate'):
-                    result = self.client.generate(extraction_prompt)
-                    key_info.append(f"SECCIÓN {chunk['section']}:\n{result.content}\n")
-                else:
-                    # For budget client, still try to extract info
-                    key_info.append(f"SECCIÓN {chunk['section']}:\n{chunk['content'][:500]}...\n")
-            except Exception as e:
-                key_info.append(f"SECCIÓN {chunk['section']}: Error procesando - {str(e)}\n")
+        # First pass: Extract key information from each chunk. The extractions are
+        # independent requests, so all are submitted before any result is awaited
+        total = len(chunks)
+        if hasattr(self.client, 'generate'):
+            pool = DaemonThreadExecutor(max_workers=MAX_EXTRACTION_WORKERS)
+            futures = [pool.submit(self._extract_key_info, i, chunk, total) for i, chunk in enumerate(chunks)]
+            key_info = [future.result() for future in futures]  # Section order is kept
+        else:
+            # The budget client has no text endpoint: extraction is local, no pool needed
+            key_info = [self._extract_key_info(i, chunk, total) for i, chunk in enumerate(chunks)]
         
         # Second pass: Generate final content based on accumulated information
+        self._check_cancelled()
         consolidated_info = "\n".join(key_info)
         
         try:
             if task_type == "narrative":
                 final_prompt = self._build_narrative_prompt(consolidated_info, project_info, is_consolidated=True)
-                result = self.client.generate(final_prompt)
-                return result.content
+                return self._generate(final_prompt).content
             else:
                 final_prompt = self._build_budget_prompt(consolidated_info, project_info, is_consolidated=True)
-                schema = self._get_budget_schema()
-                return self.client.generate_json(final_prompt, schema)
+                return self._generate_json(final_prompt)
         except Exception as e:
+            self.had_errors = True
             return f"Error en generación consolidada: {str(e)}"
     
     def _build_narrative_prompt(self, content: str, project_info: Dict, is_consolidated: bool = False) -> str:
         """Build narrative generation prompt"""
         content_type = "información consolidada" if is_consolidated else "términos de referencia"
         
-        return f"""
-Basándote en la siguiente {content_type} y información del proyecto, genera una narrativa completa para una propuesta de proyecto en {project_info.get('language', 'es')}.
-
-INFORMACIÓN DEL PROYECTO:
-- Título: {project_info.get('title', '')}
-- País: {project_info.get('country', '')}
-- Donante: {project_info.get('donor', '')}
-- Duración: {project_info.get('duration_months', '')} meses
-- Presupuesto máximo: {project_info.get('budget_cap', 'No especificado')}
-
-PERFIL DE LA ORGANIZACIÓN:
-{project_info.get('org_profile', '')}
-
-{content_type.upper()}:
-{content}
-
-Por favor genera una narrativa completa que incluya:
-1. Resumen ejecutivo
-2. Justificación del proyecto
-3. Objetivos y resultados esperados
-4. Metodología
-5. Plan de implementación
-6. Sostenibilidad
-7. Monitoreo y evaluación
-
-La narrativa debe ser profesional, convincente y alineada con los términos de referencia.
-"""
+        return _NARRATIVE_PROMPT.format(content_type=content_type, content_type_upper=content_type.upper(),
+                                        content=content, **_project_fields(project_info))
     
     def _build_budget_prompt(self, content: str, project_info: Dict, is_consolidated: bool = False) -> str:
         """Build budget generation prompt"""
         content_type = "información consolidada" if is_consolidated else "términos de referencia"
         
-        return f"""
-Basándote en la siguiente {content_type} y la información del proyecto, genera un presupuesto detallado.
-
-INFORMACIÓN DEL PROYECTO:
-- Título: {project_info.get('title', '')}
-- País: {project_info.get('country', '')}
-- Duración: {project_info.get('duration_months', '')} meses
-- Presupuesto máximo: {project_info.get('budget_cap', 'No especificado')}
-
-{content_type.upper()}:
-{content}
-
-Genera un presupuesto detallado con categorías típicas como:
-- Personal (salarios, consultores)
-- Equipamiento y suministros
-- Viajes y transporte
-- Capacitación y eventos
-- Gastos operativos
-- Costos administrativos
-
-Asegúrate de que el presupuesto sea realista y esté dentro del tope especificado.
-"""
+        return _BUDGET_PROMPT.format(content_type=content_type, content_type_upper=content_type.upper(),
+                                     content=content, **_project_fields(project_info))
     
     def _get_budget_schema(self) -> Dict:
-        """Get budget schema for JSON generation"""
-        return {
-            "currency": "USD",
-            "items": [
-                {
-                    "code": "string",
-                    "category": "string", 
-                    "description": "string",
-                    "unit": "string",
-                    "qty": "number",
-                    "unit_cost": "number",
-                    "months": "number",
-                    "phase": "string",
-                    "justification": "string"
-                }
-            ],
-            "summary_by_category": {},
-            "total": "number",
-            "assumptions": ["string"],
-            "compliance_notes": ["string"]
-        }
\ No newline at end of file
+        """Get budget schema for JSON generation (shared; callers must not mutate it)"""
+        return _BUDGET_SCHEMA
\ No newline at end of file
@@ -1,7 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, filedialog
+from tkinter import font as tkfont
 from pathlib import Path
 
+# Shared font objects, keyed by (family, size, weight)
+_FONTS = {}
+
+def get_font(family, size, weight="normal"):
+    """Return a shared tkfont.Font, creating it on first use (needs a Tk root)"""
+    key = (family, size, weight)
+    font = _FONTS.get(key)
+    if font is None:
+        font = tkfont.Font(family=family, size=size, weight=weight)
+        _FONTS[key] = font
+    return font
+
 # Backward compatibility - keep original classes
 class LabeledEntry(ttk.Frame):
     def __init__(self, master, label, var):
@@ -47,6 +60,8 @@ class EnhancedLabeledEntry(ttk.Frame):
         self.var = var
         self.placeholder = placeholder
         self.required = required
+        self._validate_after_id = None
+        self._last_valid = None
         
         # Label with required indicator
         label_text = f"{label}{'*' if required else ''}"
@@ -54,7 +69,7 @@ class EnhancedLabeledEntry(ttk.Frame):
                             text=label_text,
                             bg=self.colors['white'],
                             fg=self.colors['accent'] if required else self.colors['text'],
-                            font=('Segoe UI', 10, 'bold'))
+                            font=get_font('Segoe UI', 10, 'bold'))
         self.label.pack(anchor="w", pady=(0, 3))
         
         # Entry with enhanced styling
@@ -62,7 +77,7 @@ class EnhancedLabeledEntry(ttk.Frame):
                             textvariable=var,
                             bg=self.colors['white'],
                             fg=self.colors['text'],
-                            font=('Segoe UI', 10),
+                            font=get_font('Segoe UI', 10),
                             relief='solid',
                             bd=1,
                             highlightthickness=2,
@@ -100,9 +115,18 @@ class EnhancedLabeledEntry(ttk.Frame):
 
     def _validate(self, event=None):
         """Validate required fields"""
+        if event is not None and self._validate_after_id:
+            # Validated now from <FocusOut>, so the debounced run is no longer needed
+            self.after_cancel(self._validate_after_id)
+        self._validate_after_id = None
         if self.required:
             value = self.var.get().strip()
-            if not value or value == self.placeholder:
+            valid = bool(value) and value != self.placeholder
+            if valid == self._last_valid:
+                return
+            self._last_valid = valid
+            
+            if not valid:
                 self.entry.config(highlightbackground='red', highlightcolor='red')
                 self.label.config(fg='red')
             else:
@@ -111,9 +135,18 @@ class EnhancedLabeledEntry(ttk.Frame):
                 self.label.config(fg=self.colors['accent'])
 
     def _on_change(self, event=None):
-        """Handle text changes"""
+        """Handle text changes (validation is debounced while typing)"""
         if self.required:
-            self._validate()
+            if self._validate_after_id:
+                self.after_cancel(self._validate_after_id)
+            self._validate_after_id = self.after(150, self._validate)
+
+    def destroy(self):
+        # A pending debounced validation would otherwise configure the dead entry
+        if self._validate_after_id:
+            self.after_cancel(self._validate_after_id)
+            self._validate_after_id = None
+        super().destroy()
 
     def get_value(self):
         """Get the actual value (not placeholder)"""
@@ -154,7 +187,7 @@ class ModernFilePicker(ttk.Frame):
                              text=label,
                              bg=self.colors['white'],
                              fg=self.colors['text'],
-                             font=('Segoe UI', 12, 'bold'))
+                             font=get_font('Segoe UI', 12, 'bold'))
         title_label.pack(anchor="w")
         
         if description:
@@ -162,7 +195,7 @@ class ModernFilePicker(ttk.Frame):
                                 text=description,
                                 bg=self.colors['white'],
                                 fg=self.colors['text'],
-                                font=('Segoe UI', 9))
+                                font=get_font('Segoe UI', 9))
             desc_label.pack(anchor="w", pady=(2, 0))
         
         # Drop zone
@@ -182,14 +215,14 @@ class ModernFilePicker(ttk.Frame):
                                 text="📁",
                                 bg=self.colors['light_gray'],
                                 fg=self.colors['text'],
-                                font=('Segoe UI', 24))
+                                font=get_font('Segoe UI', 24))
         self.drop_icon.pack()
         
         self.drop_text = tk.Label(self.drop_content,
                                 text="Arrastra archivos aquí o haz clic para seleccionar",
                                 bg=self.colors['light_gray'],
                                 fg=self.colors['text'],
-                                font=('Segoe UI', 10))
+                                font=get_font('Segoe UI', 10))
         self.drop_text.pack(pady=(5, 0))
         
         # File info display
@@ -200,33 +233,40 @@ class ModernFilePicker(ttk.Frame):
                                  text="Sin archivos seleccionados",
                                  bg=self.colors['white'],
                                  fg=self.colors['text'],
-                                 font=('Segoe UI', 9))
+                                 font=get_font('Segoe UI', 9))
         self.info_label.pack(anchor="w")
         
+        # Widgets that share the drop zone background
+        self._zone_widgets = (self.drop_zone, self.drop_content, self.drop_icon, self.drop_text)
+        self._idle_bg = self.colors['light_gray']
+        self._hover_bg = self.colors['secondary']
+        self._zone_bg = self._idle_bg
+        
         # Bind click events
         self._bind_click_events()
 
     def _bind_click_events(self):
         """Bind click events to all clickable elements"""
-        widgets = [self.drop_zone, self.drop_content, self.drop_icon, self.drop_text]
-        for widget in widgets:
+        for widget in self._zone_widgets:
             widget.bind("<Button-1>", self._on_click)
             widget.bind("<Enter>", self._on_hover_enter)
             widget.bind("<Leave>", self._on_hover_leave)
 
+    def _set_zone_bg(self, color):
+        """Apply a background color to the whole drop zone"""
+        if color == self._zone_bg:
+            return
+        self._zone_bg = color
+        for widget in self._zone_widgets:
+            widget.configure(bg=color)
+
     def _on_hover_enter(self, event):
         """Handle hover enter"""
-        self.drop_zone.config(bg=self.colors['secondary'])
-        self.drop_content.config(bg=self.colors['secondary'])
-        self.drop_icon.config(bg=self.colors['secondary'])
-        self.drop_text.config(bg=self.colors['secondary'])
+        self._set_zone_bg(self._hover_bg)
 
     def _on_hover_leave(self, event):
         """Handle hover leave"""
-        self.drop_zone.config(bg=self.colors['light_gray'])
-        self.drop_content.config(bg=self.colors['light_gray'])
-        self.drop_icon.config(bg=self.colors['light_gray'])
-        self.drop_text.config(bg=self.colors['light_gray'])
+        self._set_zone_bg(self._idle_bg)
 
     def _on_click(self, event):
         """Handle file selection"""
@@ -246,29 +286,31 @@ class ModernFilePicker(ttk.Frame):
     def _update_display_single(self, path):
         """Update display for single file"""
         file_path = Path(path)
+        file_name = file_path.name
         file_size = file_path.stat().st_size / 1024  # KB
         
         # Update drop zone
         self.drop_icon.config(text="✅")
-        self.drop_text.config(text=f"{file_path.name}")
+        self.drop_text.config(text=file_name)
         
         # Update info
         self.info_label.config(
-            text=f"📄 {file_path.name} ({file_size:.1f} KB)",
+            text=f"📄 {file_name} ({file_size:.1f} KB)",
             fg=self.colors['accent']
         )
 
     def _update_display_multiple(self, paths):
         """Update display for multiple files"""
-        file_count = len(paths)
-        total_size = sum(Path(p).stat().st_size for p in paths) / 1024  # KB
+        file_paths = [Path(p) for p in paths]
+        file_count = len(file_paths)
+        total_size = sum(p.stat().st_size for p in file_paths) / 1024  # KB
         
         # Update drop zone
         self.drop_icon.config(text="✅")
         self.drop_text.config(text=f"{file_count} archivos seleccionados")
         
         # Update info
-        file_list = "\n".join([f"• {Path(p).name}" for p in paths[:3]])
+        file_list = "\n".join(f"• {p.name}" for p in file_paths[:3])
         if file_count > 3:
             file_list += f"\n• ... y {file_count - 3} más"
         
@@ -285,8 +327,45 @@ class ModernFilePicker(ttk.Frame):
         self.info_label.config(text="Sin archivos seleccionados", fg=self.colors['text'])
 
 
-class ProgressCard(tk.Frame):
-    """Progress card widget for showing completion status"""
+class _LazyBuildMixin:
+    """Defers a widget's _build() until the widget is first mapped
+    
+    Call _defer_build() from __init__. The <Map> handler is added alongside any
+    binding a caller makes and stays bound; once built, later maps are no-ops.
+    """
+
+    def _defer_build(self):
+        self._built = False
+        self.bind('<Map>', self._lazy_build, add='+')
+
+    def _lazy_build(self, event=None):
+        if self._built:
+            return
+        self._built = True
+        self._build()
+        self._after_build()
+
+    def _after_build(self):
+        """Hook run once the widgets exist"""
+
+
+class ProgressCard(_LazyBuildMixin, tk.Frame):
+    """Progress card widget for showing completion status
+    
+    The card's widgets are built the first time it is mapped: until then
+    card, progress_bar and steps_frame do not exist and step_labels is empty.
+    For updates made before that, only the latest status of each step and the
+    latest progress position are kept, and applied once the widgets exist.
+    """
+
+    # Icon and foreground color per step status
+    _STATUS_STYLES = {
+        "completed": ("✅", '#4CAF50'),
+        "current": ("🔄", '#FF9800'),
+        "error": ("❌", '#F44336'),
+        "pending": ("⏳", '#2E7D32')
+    }
+
     def __init__(self, master, title, steps):
         super().__init__(master)
         
@@ -304,9 +383,27 @@ class ProgressCard(tk.Frame):
             'error': '#F44336'
         }
         
+        self.title = title
         self.steps = steps
         self.current_step = 0
+        self.step_labels = []
         
+        # Deferred construction until the card is first shown
+        self._pending_steps = {}  # step_index -> latest status
+        self._pending_progress = None  # Step index of the latest progress position
+        self._defer_build()
+
+    def _after_build(self):
+        """Apply updates made while the card was hidden"""
+        pending, self._pending_steps = self._pending_steps, {}
+        for step_index, status in pending.items():
+            self._apply_step_style(step_index, status)
+        if self._pending_progress is not None:
+            self._set_progress(self._pending_progress)
+            self._pending_progress = None
+
+    def _build(self):
+        """Create the card widgets"""
         # Main card
         self.card = tk.Frame(self, bg=self.colors['white'], relief='solid', bd=1)
         self.card.pack(fill="both", expand=True, padx=5, pady=5)
@@ -316,10 +413,10 @@ class ProgressCard(tk.Frame):
         header.pack(fill="x", padx=15, pady=(15, 10))
         
         title_label = tk.Label(header,
-                             text=title,
+                             text=self.title,
                              bg=self.colors['white'],
                              fg=self.colors['text'],
-                             font=('Segoe UI', 12, 'bold'))
+                             font=get_font('Segoe UI', 12, 'bold'))
         title_label.pack(anchor="w")
         
         # Progress bar
@@ -332,7 +429,6 @@ class ProgressCard(tk.Frame):
         self.steps_frame = tk.Frame(self.card, bg=self.colors['white'])
         self.steps_frame.pack(fill="both", expand=True, padx=15, pady=(0, 15))
         
-        self.step_labels = []
         self._create_steps()
 
     def _create_steps(self):
@@ -346,7 +442,7 @@ class ProgressCard(tk.Frame):
                                   text="⏳",
                                   bg=self.colors['white'],
                                   fg=self.colors['text'],
-                                  font=('Segoe UI', 10))
+                                  font=get_font('Segoe UI', 10))
             status_label.pack(side="left", padx=(0, 10))
             
             # Step text
@@ -354,43 +450,78 @@ class ProgressCard(tk.Frame):
                                 text=step,
                                 bg=self.colors['white'],
                                 fg=self.colors['text'],
-                                font=('Segoe UI', 10))
+                                font=get_font('Segoe UI', 10))
             text_label.pack(side="left", anchor="w")
             
             self.step_labels.append((status_label, text_label))
 
     def update_step(self, step_index, status="completed"):
         """Update step status"""
-        if step_index < len(self.step_labels):
+        if not self._built:
+            self._pending_steps[step_index] = status
+            self._pending_progress = step_index
+            return
+        
+        self._apply_step_style(step_index, status)
+        self._set_progress(step_index)
+
+    def update_steps(self, updates):
+        """Apply several (step_index, status) updates; Tk redraws them together on idle"""
+        updates = list(updates)
+        if not updates:
+            return
+        if not self._built:
+            self._pending_steps.update(updates)
+            self._pending_progress = updates[-1][0]
+            return
+        
+        for step_index, status in updates:
+            self._apply_step_style(step_index, status)
+        self._set_progress(updates[-1][0])
+
+    def _apply_step_style(self, step_index, status):
+        """Set icon and color of one step (one configure call per label)"""
+        if step_index < len(self.step_labels) and status in self._STATUS_STYLES:
             status_label, text_label = self.step_labels[step_index]
-            
-            if status == "completed":
-                status_label.config(text="✅", fg=self.colors['success'])
-                text_label.config(fg=self.colors['success'])
-            elif status == "current":
-                status_label.config(text="🔄", fg=self.colors['warning'])
-                text_label.config(fg=self.colors['warning'])
-            elif status == "error":
-                status_label.config(text="❌", fg=self.colors['error'])
-                text_label.config(fg=self.colors['error'])
-        
-        # Update progress bar
+            icon, color = self._STATUS_STYLES[status]
+            status_label.configure(text=icon, fg=color)
+            text_label.configure(fg=color)
+
+    def _set_progress(self, step_index):
+        """Move the progress bar to the given step"""
         progress = (step_index + 1) / len(self.steps) * 100
-        self.progress_bar['value'] = progress
+        self.progress_bar.configure(value=progress)
 
     def reset(self):
         """Reset all steps to pending"""
+        if not self._built:
+            # Nothing shown yet, so earlier queued updates are moot
+            self._pending_steps.clear()
+            self._pending_progress = None
+            return
+        
+        icon, color = self._STATUS_STYLES["pending"]
         for status_label, text_label in self.step_labels:
-            status_label.config(text="⏳", fg=self.colors['text'])
-            text_label.config(fg=self.colors['text'])
-        self.progress_bar['value'] = 0
+            status_label.configure(text=icon, fg=color)
+            text_label.configure(fg=color)
+        self.progress_bar.configure(value=0)
 
 
-class InfoCard(tk.Frame):
-    """Information card widget"""
+class InfoCard(_LazyBuildMixin, tk.Frame):
+    """Information card widget (built the first time it is mapped)"""
     def __init__(self, master, title, content, icon="ℹ️", card_type="info"):
         super().__init__(master)
         
+        self.title = title
+        self.content = content
+        self.icon = icon
+        self.card_type = card_type
+        
+        # Deferred construction until the card is first shown
+        self._defer_build()
+
+    def _build(self):
+        """Create the card widgets"""
         # Color scheme based on card type
         type_colors = {
             'info': {'bg': '#E3F2FD', 'border': '#2196F3', 'text': '#1976D2'},
@@ -399,7 +530,7 @@ class InfoCard(tk.Frame):
             'error': {'bg': '#FFEBEE', 'border': '#F44336', 'text': '#D32F2F'}
         }
         
-        colors = type_colors.get(card_type, type_colors['info'])
+        colors = type_colors.get(self.card_type, type_colors['info'])
         
         # Main card
         card = tk.Frame(self, 
@@ -419,25 +550,25 @@ class InfoCard(tk.Frame):
         header.pack(fill="x", pady=(0, 10))
         
         icon_label = tk.Label(header,
-                            text=icon,
+                            text=self.icon,
                             bg=colors['bg'],
                             fg=colors['text'],
-                            font=('Segoe UI', 14))
+                            font=get_font('Segoe UI', 14))
         icon_label.pack(side="left", padx=(0, 10))
         
         title_label = tk.Label(header,
-                             text=title,
+                             text=self.title,
                              bg=colors['bg'],
                              fg=colors['text'],
-                             font=('Segoe UI', 11, 'bold'))
+                             font=get_font('Segoe UI', 11, 'bold'))
         title_label.pack(side="left")
         
         # Content text
         content_label = tk.Label(content_frame,
-                               text=content,
+                               text=self.content,
                                bg=colors['bg'],
                                fg=colors['text'],
-                               font=('Segoe UI', 10),
+                               font=get_font('Segoe UI', 10),
                                wraplength=400,
                                justify="left")
         content_label.pack(anchor="w")
\ No newline at end of file
@@ -1,15 +1,194 @@
 import os
+import sys
+import signal
+import subprocess
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, filedialog, messagebox
 from ui.components import LabeledEntry, FilePicker
-from services.llm_providers import DeepSeekClient, SonnetClient
-from services.document_processor import DocumentProcessor
-from services.token_manager import TokenManager, ChainedPromptGenerator
-from validation.schemas import BudgetResult
+from services.token_manager import TokenManager, ChainedPromptGenerator, GenerationAborted, PROMPT_VERSION
+from services.llm_cache import LLMCache
+from services.daemon_executor import DaemonThreadExecutor
 from pathlib import Path
 import json
+import queue
+import sqlite3
+import multiprocessing
+import asyncio
 import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from functools import lru_cache
+
+# Number of most recent entries kept in the execution log
+MAX_LOG_LINES = 2000
+
+# Background-to-UI queue: drain interval (ms) and max callbacks run per drain
+UI_DRAIN_INTERVAL_MS = 50
+UI_DRAIN_BATCH = 100
+
+# Seconds an output-file existence check is trusted before the path is stat'ed again
+PATH_EXISTS_TTL = 2.0
+
+# ToR preview: characters shown, and slice size inserted per idle callback
+MAX_PREVIEW_CHARS = 2000
+PREVIEW_SLICE_CHARS = 1024
+
+# Platform opener for files and folders, resolved once at import. The process
+# holds descriptors the launcher must not get (the SQLite cache, the extraction
+# pool's pipes, pooled HTTPS sockets), but Python creates them non-inheritable
+# (PEP 446), so close_fds=False only skips closing every fd in the child. Its
+# standard streams are detached from the app's.
+_LAUNCHER_OPTIONS = dict(
+    close_fds=False,
+    stdin=subprocess.DEVNULL,
+    stdout=subprocess.DEVNULL,
+    stderr=subprocess.DEVNULL
+)
+
+if sys.platform.startswith("win"):
+    _open_with_system = os.startfile
+elif sys.platform == "darwin":
+    def _open_with_system(path):
+        subprocess.Popen(["open", path], **_LAUNCHER_OPTIONS)
+else:
+    def _open_with_system(path):
+        subprocess.Popen(["xdg-open", path], **_LAUNCHER_OPTIONS)
+
+# Persistent event loop running generations, started on first use
+_LOOP = None
+
+def _background_loop():
+    """Return the background asyncio loop, starting its daemon thread if needed"""
+    global _LOOP
+    if _LOOP is None:
+        _LOOP = asyncio.new_event_loop()
+        threading.Thread(target=_LOOP.run_forever, daemon=True).start()
+    return _LOOP
+
+# Blocking steps of a generation, awaited from the background loop
+_BLOCKING_CALLS = DaemonThreadExecutor()
+
+def _run_blocking(func, *args):
+    """Await a blocking call run on a daemon thread (see DaemonThreadExecutor)"""
+    return asyncio.get_running_loop().run_in_executor(_BLOCKING_CALLS, func, *args)
+
+def _fanout(pool, calls):
+    """Run (func, *args) calls on pool and return their results in order.
+    
+    Every call is submitted before any result is awaited; calling result()
+    inside the submit loop would run the calls one after another.
+    """
+    futures = [pool.submit(func, *args) for func, *args in calls]
+    return [future.result() for future in futures]
+
+@lru_cache(maxsize=None)
+def _api_keys():
+    """(DeepSeek, Sonnet) API keys from the environment; cleared when settings are re-checked or saved"""
+    return os.getenv("DEEPSEEK_API_KEY"), os.getenv("SONNET_API_KEY")
+
+@lru_cache(maxsize=1)
+def _format_clock(second):
+    return time.strftime("%H:%M:%S", time.localtime(second))
+
+def _log_timestamp():
+    """Current HH:MM:SS, formatted at most once per second"""
+    return _format_clock(int(time.time()))
+
+# Process running ToR text extraction, started on first use. PDF/DOCX parsing is
+# pure-Python CPU work; in a separate process it does not hold the GIL away from Tk.
+_EXTRACTION_POOL = None
+_EXTRACTION_PID = None
+
+def _extraction_pool():
+    global _EXTRACTION_POOL, _EXTRACTION_PID
+    if _EXTRACTION_POOL is None:
+        # Spawned, not forked: forking a process running Tk and several threads is unsafe
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        # The single worker reports its own pid, so closing the window can stop it mid-extraction
+        _EXTRACTION_PID = pool.submit(os.getpid).result()
+        _EXTRACTION_POOL = pool
+    return _EXTRACTION_POOL
+
+def _terminate_extraction_pool():
+    """Stop the extraction process, including an extraction still running"""
+    global _EXTRACTION_POOL, _EXTRACTION_PID
+    pool, _EXTRACTION_POOL = _EXTRACTION_POOL, None
+    pid, _EXTRACTION_PID = _EXTRACTION_PID, None
+    if pool is None:
+        return
+    pool.shutdown(wait=False, cancel_futures=True)
+    # shutdown() never interrupts a running task, and the interpreter's exit hook would
+    # then wait for it; killing the worker lets the app exit as soon as the window closes
+    if pid is not None:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass  # Already exited
+
+def _chunk_tor(content):
+    """Chunk ToR content for each provider's context window"""
+    return {
+        "deepseek": TokenManager.intelligent_chunk_tor(content, TokenManager.get_max_content_tokens("deepseek")),
+        "sonnet": TokenManager.intelligent_chunk_tor(content, TokenManager.get_max_content_tokens("sonnet"))
+    }
+
+# Successfully processed ToR files, (path, mtime_ns, size) -> (content, chunks, content_hash).
+# Only touched by the wizard's single worker thread; oldest entries are evicted.
+_TOR_CACHE = {}
+_TOR_CACHE_SIZE = 8
+
+def _process_tor(path, mtime_ns, size):
+    """Extract and chunk a ToR file, returns (content, chunks).
+    
+    Picking an unchanged file again costs one stat: results are cached on the
+    file's path, mtime and size. Otherwise the file is hashed first, and a cached
+    result for the same bytes (a copy, or a file saved again unchanged) is reused
+    without extracting. Failures are never cached: a locked or unreadable file is retried.
+    """
+    key = (path, mtime_ns, size)
+    if key in _TOR_CACHE:
+        return _TOR_CACHE[key][:2]
+    
+    from services.document_processor import DocumentProcessor
+    content_hash = DocumentProcessor.file_hash(path)
+    same_bytes = [entry for entry in _TOR_CACHE.values() if content_hash and entry[2] == content_hash]
+    if same_bytes:
+        result = same_bytes[0]
+    else:
+        try:
+            content = _extraction_pool().submit(DocumentProcessor.extract_text_from_file, path).result()
+        except (BrokenProcessPool, OSError):
+            # The extraction process died or could not be started: extract in this thread instead
+            _terminate_extraction_pool()
+            content = DocumentProcessor.extract_text_from_file(path)
+        if not content or content.startswith("Error"):
+            return content, None
+        result = (content, _chunk_tor(content), content_hash)
+    
+    if len(_TOR_CACHE) >= _TOR_CACHE_SIZE:
+        del _TOR_CACHE[next(iter(_TOR_CACHE))]
+    _TOR_CACHE[key] = result
+    return result[:2]
+
+# Every text shown in the progress label, used to size it once
+_PROGRESS_TEXTS = (
+    "Listo para generar",
+    "🚀 Iniciando generación...",
+    "📝 Generando narrativa y presupuesto...",
+    "📊 Procesando resultados...",
+    "📄 Generando documentos...",
+    "🎉 ¡Generación completada!",
+    "Generación completada",
+)
+
+# Combobox choices
+_LANGUAGES = ("es", "en")
+_NARRATIVE_MODELS = ("DeepSeek",)
+_BUDGET_MODELS = ("Sonnet",)
 
 class ProposalWizard(ttk.Frame):
     def __init__(self, master):
@@ -20,12 +199,83 @@ class ProposalWizard(ttk.Frame):
             "tor_path": None,
             "tor_content": None,
             "tor_chunks": [],
-            "models": {"narrative": "DeepSeek", "budget": "Sonnet", "temperature": 0.2, "max_tokens": 4000, "language": "es"},
+            "models": {"narrative": "DeepSeek", "budget": "Sonnet", "temperature": 0.2, "max_tokens": 4000, "language": "es", "use_cache": False},
             "templates": {"docx": None, "xlsx": None},
-            "results": {"narrative": None, "budget": None, "output_paths": {}}
+            "results": {"narrative": None, "budget": None, "output_paths": {}, "output_names": {}}
         }
         self._processing = False
+        self._current_future = None
+        self._cancel_event = threading.Event()
+        self._generation_id = 0
+        self._pending_progress = None  # Latest (value, text) not yet shown
+        self._progress_lock = threading.Lock()
+        self._text_streams = {}
+        self._path_exists_cache = {}  # path -> (monotonic time checked, exists)
+        self._listed_paths = []  # Output paths shown in the files listbox, by row
+        self._log_buffer = deque(maxlen=MAX_LOG_LINES)
+        self._log_flush_scheduled = False
+        self._ui_queue = queue.Queue()
         self._build()
+        self.master.after(UI_DRAIN_INTERVAL_MS, self._drain_ui_queue)
+        
+        # One long-lived worker runs blocking UI-triggered tasks in submission order
+        self._task_queue = queue.Queue()
+        threading.Thread(target=self._worker_loop, daemon=True).start()
+        
+        # Narratives already generated for identical inputs are reused across runs
+        self._llm_cache = LLMCache(Path.cwd() / "runs" / "llm_cache.sqlite")
+        
+        # Output files of a run (DOCX, XLSX, metadata) are written in parallel on this pool
+        self._io_pool = DaemonThreadExecutor(max_workers=3)
+        self.master.protocol("WM_DELETE_WINDOW", self._on_window_close)
+
+    def _on_window_close(self):
+        self._cancel_event.set()
+        self._io_pool.shutdown(wait=False, cancel_futures=True)
+        _terminate_extraction_pool()
+        self._llm_cache.close()
+        self.master.destroy()
+
+    def _run_in_worker(self, func, *args):
+        """Queue a blocking task for the background worker thread"""
+        self._task_queue.put((func, args))
+
+    def _worker_loop(self):
+        while True:
+            func, args = self._task_queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                self._post_log(f"❌ Error en tarea de fondo: {str(e)}")
+
+    def _post_ui(self, callback, *args):
+        """Queue a UI update from a background thread; run by _drain_ui_queue on the Tk thread"""
+        self._ui_queue.put((callback, args))
+
+    def _report_progress(self, value, text):
+        """Post a progress update; one queued flush shows whatever update is latest when it runs"""
+        with self._progress_lock:
+            flush_queued = self._pending_progress is not None
+            self._pending_progress = (value, text)
+        if not flush_queued:
+            self._post_ui(self._flush_progress)
+
+    def _flush_progress(self):
+        with self._progress_lock:
+            value, text = self._pending_progress
+            self._pending_progress = None
+        self._update_progress(value, text)
+
+    def _drain_ui_queue(self):
+        try:
+            for _ in range(UI_DRAIN_BATCH):
+                try:
+                    callback, args = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                callback(*args)
+        finally:
+            self.master.after(UI_DRAIN_INTERVAL_MS, self._drain_ui_queue)
 
     def _build(self):
         nb = ttk.Notebook(self)
@@ -42,12 +292,23 @@ class ProposalWizard(ttk.Frame):
         nb.add(self.tab3, text="LLM & Plantillas")
         nb.add(self.tab4, text="Generación")
         nb.add(self.tab5, text="Resultados")
+        self.notebook = nb
 
+        # Only the first tab is built up front; the rest are built on first selection
+        self._tab_builders = {
+            str(self.tab2): self._build_tab2,
+            str(self.tab3): self._build_tab3,
+            str(self.tab4): self._build_tab4,
+            str(self.tab5): self._build_tab5
+        }
         self._build_tab1()
-        self._build_tab2()
-        self._build_tab3()
-        self._build_tab4()
-        self._build_tab5()
+        nb.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _on_tab_changed(self, event):
+        """Build a tab's contents the first time it is selected"""
+        builder = self._tab_builders.pop(self.notebook.select(), None)
+        if builder:
+            builder()
 
     def _build_tab1(self):
         frm = ttk.Frame(self.tab1)
@@ -60,13 +321,27 @@ class ProposalWizard(ttk.Frame):
         self.duration_var = tk.StringVar()
         self.cap_var = tk.StringVar()
         self.org_var = tk.Text(self.tab1, height=6, wrap="word")
+        self.org_var.edit_modified(True)  # So the first save always stores the profile, even if empty
+        
+        # Form fields keyed as stored in _state["project"]; writes mark them dirty
+        self._project_vars = {
+            "title": self.title_var,
+            "country": self.country_var,
+            "language": self.lang_var,
+            "donor": self.donor_var,
+            "duration_months": self.duration_var,
+            "budget_cap": self.cap_var
+        }
+        self._project_dirty = set(self._project_vars)
+        for key, var in self._project_vars.items():
+            var.trace_add("write", lambda *args, key=key: self._project_dirty.add(key))
 
         LabeledEntry(frm, "Título del proyecto", self.title_var).pack(fill="x", pady=6)
         LabeledEntry(frm, "País", self.country_var).pack(fill="x", pady=6)
 
         lang_row = ttk.Frame(frm); lang_row.pack(fill="x", pady=6)
         ttk.Label(lang_row, text="Idioma").pack(side="left")
-        ttk.Combobox(lang_row, textvariable=self.lang_var, values=["es","en"], state="readonly", width=8).pack(side="left", padx=8)
+        ttk.Combobox(lang_row, textvariable=self.lang_var, values=_LANGUAGES, state="readonly", width=8).pack(side="left", padx=8)
 
         LabeledEntry(frm, "Donante", self.donor_var).pack(fill="x", pady=6)
         LabeledEntry(frm, "Duración (meses)", self.duration_var).pack(fill="x", pady=6)
@@ -80,29 +355,27 @@ class ProposalWizard(ttk.Frame):
         save_btn.pack(anchor="e", pady=8)
 
     def _save_project_inputs(self):
-        self._state["project"] = {
-            "title": self.title_var.get().strip(),
-            "country": self.country_var.get().strip(),
-            "language": self.lang_var.get(),
-            "donor": self.donor_var.get().strip(),
-            "duration_months": self.duration_var.get().strip(),
-            "budget_cap": self.cap_var.get().strip(),
-            "org_profile": self.org_var.get("1.0","end").strip()
-        }
+        # Only fields written since the last save are read back
+        project = self._state["project"]
+        for key, var in self._project_vars.items():
+            if key in self._project_dirty:
+                value = var.get()
+                project[key] = value if key == "language" else value.strip()
+        self._project_dirty.clear()
+        # Tk's modified flag tells whether the profile was edited since the last save
+        if self.org_var.edit_modified():
+            project["org_profile"] = self.org_var.get("1.0","end").strip()
+            self.org_var.edit_modified(False)
         messagebox.showinfo("OK", "Datos del proyecto guardados correctamente.")
 
     def _build_tab2(self):
         top = ttk.Frame(self.tab2); top.pack(fill="x")
         self.tor_picker = FilePicker(top, "Seleccionar ToR (PDF/DOCX)", [("PDF","*.pdf"),("Word","*.docx")], self._on_pick_tor)
         self.tor_picker.pack(fill="x", pady=6)
+        # Also serves as the (static) progress indicator while a document is processed
         self.tor_info = ttk.Label(self.tab2, text="Sin archivo seleccionado.")
         self.tor_info.pack(anchor="w", pady=8)
         
-        # Add progress bar for document processing
-        self.tor_progress = ttk.Progressbar(self.tab2, mode='indeterminate')
-        self.tor_progress.pack(fill="x", pady=8)
-        self.tor_progress.pack_forget()  # Hide initially
-        
         # Document analysis info
         analysis_frame = ttk.LabelFrame(self.tab2, text="Análisis del Documento")
         analysis_frame.pack(fill="x", pady=10)
@@ -123,37 +396,35 @@ class ProposalWizard(ttk.Frame):
 
     def _on_pick_tor(self, path):
         self._state["tor_path"] = path
-        self.tor_info.config(text=f"Procesando: {Path(path).name}...")
-        self.tor_progress.pack(fill="x", pady=8)
-        self.tor_progress.start()
+        filename = os.path.basename(path)
+        self.tor_info.config(text=f"⏳ Procesando: {filename}...")
         
-        # Process document in separate thread
+        # Process document on the background worker
         def process_document():
-            content = DocumentProcessor.extract_text_from_file(path)
-            self.master.after(0, self._tor_processing_complete, content, Path(path).name)
+            try:
+                st = os.stat(path)
+                # Extraction and chunking are CPU work, so they stay on this thread too
+                content, chunks = _process_tor(path, st.st_mtime_ns, st.st_size)
+            except Exception as e:
+                self._post_ui(self._tor_processing_complete, f"Error al procesar archivo: {str(e)}", filename)
+                return
+            self._post_ui(self._tor_processing_complete, content, filename, chunks)
         
-        threading.Thread(target=process_document, daemon=True).start()
+        self._run_in_worker(process_document)
 
-    def _tor_processing_complete(self, content, filename):
-        self.tor_progress.stop()
-        self.tor_progress.pack_forget()
-        
+    def _tor_processing_complete(self, content, filename, chunks=None):
         if content and not content.startswith("Error"):
             self._state["tor_content"] = content
             
-            # Analyze document and create chunks
+            # Analyze document (chunks were built by the processing thread)
             estimated_tokens = TokenManager.estimate_tokens(content)
             max_tokens_deepseek = TokenManager.get_max_content_tokens("deepseek")
             max_tokens_sonnet = TokenManager.get_max_content_tokens("sonnet")
             
-            # Create chunks for different providers
-            deepseek_chunks = TokenManager.intelligent_chunk_tor(content, max_tokens_deepseek)
-            sonnet_chunks = TokenManager.intelligent_chunk_tor(content, max_tokens_sonnet)
+            deepseek_chunks = chunks["deepseek"]
+            sonnet_chunks = chunks["sonnet"]
             
-            self._state["tor_chunks"] = {
-                "deepseek": deepseek_chunks,
-                "sonnet": sonnet_chunks
-            }
+            self._state["tor_chunks"] = chunks
             
             # Update UI with analysis
             analysis_text = f"""
@@ -168,26 +439,51 @@ class ProposalWizard(ttk.Frame):
             self.tor_info.config(text=f"✅ ToR procesado correctamente: {filename}")
             
             # Show preview
-            self.tor_preview.config(state="normal")
-            self.tor_preview.delete("1.0", "end")
-            preview_text = content[:2000] + "\n\n... (documento continúa)" if len(content) > 2000 else content
-            self.tor_preview.insert("1.0", preview_text)
-            self.tor_preview.config(state="disabled")
+            if len(content) > MAX_PREVIEW_CHARS:
+                preview_text = content[:MAX_PREVIEW_CHARS] + "\n\n... (documento continúa)"
+            else:
+                preview_text = content
             
             # Show chunk info if multiple chunks
             if len(deepseek_chunks) > 1:
                 chunk_info = "\n\n=== SECCIONES IDENTIFICADAS ===\n"
                 for i, chunk in enumerate(deepseek_chunks):
                     chunk_info += f"{i+1}. {chunk['section']} (~{TokenManager.estimate_tokens(chunk['content'])} tokens)\n"
-                
-                self.tor_preview.config(state="normal")
-                self.tor_preview.insert("end", chunk_info)
-                self.tor_preview.config(state="disabled")
+                preview_text += chunk_info
+            
+            self._stream_into_text(self.tor_preview, preview_text, PREVIEW_SLICE_CHARS)
         else:
             self.tor_info.config(text=f"❌ Error procesando {filename}")
             self.doc_analysis.config(text=f"Error: {content}")
             messagebox.showerror("Error", f"No se pudo procesar el archivo:\n{content}")
 
+    def _stream_into_text(self, widget, text, chunk=PREVIEW_SLICE_CHARS):
+        """Replace the content of a read-only Text widget, inserting it in slices on idle"""
+        token = object()
+        self._text_streams[str(widget)] = token
+        # Swap the old content for the first slice in a single edit
+        widget.config(state="normal")
+        widget.replace("1.0", "end", text[:chunk])
+        widget.config(state="disabled")
+        if chunk < len(text):
+            self.master.after_idle(self._stream_next_slice, widget, text, chunk, chunk, token)
+        else:
+            del self._text_streams[str(widget)]
+
+    def _stream_next_slice(self, widget, text, start, chunk, token):
+        if self._text_streams.get(str(widget)) is not token:
+            return  # Superseded by a newer stream into the same widget
+        
+        widget.config(state="normal")
+        widget.insert("end", text[start:start + chunk])
+        widget.config(state="disabled")
+        
+        start += chunk
+        if start < len(text):
+            self.master.after_idle(self._stream_next_slice, widget, text, start, chunk, token)
+        else:
+            del self._text_streams[str(widget)]
+
     def _build_tab3(self):
         frm = ttk.Frame(self.tab3); frm.pack(fill="x")
         
@@ -222,12 +518,12 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         model_row1 = ttk.Frame(model_frame); model_row1.pack(fill="x", pady=6, padx=10)
         ttk.Label(model_row1, text="Modelo narrativo").pack(side="left")
         self.narrative_var = tk.StringVar(value="DeepSeek")
-        ttk.Combobox(model_row1, textvariable=self.narrative_var, values=["DeepSeek"], state="readonly", width=20).pack(side="left", padx=8)
+        ttk.Combobox(model_row1, textvariable=self.narrative_var, values=_NARRATIVE_MODELS, state="readonly", width=20).pack(side="left", padx=8)
 
         model_row2 = ttk.Frame(model_frame); model_row2.pack(fill="x", pady=6, padx=10)
         ttk.Label(model_row2, text="Modelo presupuesto").pack(side="left")
         self.budget_var = tk.StringVar(value="Sonnet")
-        ttk.Combobox(model_row2, textvariable=self.budget_var, values=["Sonnet"], state="readonly", width=20).pack(side="left", padx=8)
+        ttk.Combobox(model_row2, textvariable=self.budget_var, values=_BUDGET_MODELS, state="readonly", width=20).pack(side="left", padx=8)
 
         # Parameters
         param_frame = ttk.LabelFrame(frm, text="Parámetros")
@@ -247,6 +543,17 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         self.max_tokens_var = tk.IntVar(value=4000)
         ttk.Entry(tokens_row, textvariable=self.max_tokens_var, width=10).pack(side="left", padx=8)
 
+        # Narrative cache
+        cache_frame = ttk.LabelFrame(frm, text="Caché de narrativas")
+        cache_frame.pack(fill="x", pady=10)
+        
+        cache_row = ttk.Frame(cache_frame); cache_row.pack(fill="x", pady=6, padx=10)
+        # Off by default: a cached narrative is returned instead of a new one for identical inputs
+        self.use_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cache_row, text="Reutilizar narrativas generadas con los mismos datos",
+                        variable=self.use_cache_var, command=self._on_toggle_cache).pack(side="left")
+        ttk.Button(cache_row, text="Limpiar caché", command=self._clear_llm_cache).pack(side="right")
+
         # Templates
         tpl_frame = ttk.LabelFrame(self.tab3, text="Plantillas")
         tpl_frame.pack(fill="x", pady=10)
@@ -262,12 +569,25 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         # Check API status on startup
         self.master.after(100, self._check_api_status)
 
+    def _on_toggle_cache(self):
+        # Applied immediately: the generation thread reads it from state, never from the Tk variable
+        self._state["models"]["use_cache"] = self.use_cache_var.get()
+
+    def _clear_llm_cache(self):
+        if messagebox.askyesno("Confirmar", "¿Borrar todas las narrativas guardadas en caché?"):
+            try:
+                self._llm_cache.clear()
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo limpiar la caché: {str(e)}")
+                return
+            messagebox.showinfo("OK", "Caché de narrativas limpiada.")
+
     def _update_temp_label(self, value):
         self.temp_label.config(text=f"{float(value):.1f}")
 
     def _check_api_status(self):
-        deepseek_key = os.getenv("DEEPSEEK_API_KEY")
-        sonnet_key = os.getenv("SONNET_API_KEY")
+        _api_keys.cache_clear()
+        deepseek_key, sonnet_key = _api_keys()
         
         deepseek_status = "✅ Configurado" if deepseek_key else "❌ No configurado"
         sonnet_status = "✅ Configurado" if sonnet_key else "❌ No configurado"
@@ -286,6 +606,7 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         self._state["models"]["budget"] = self.budget_var.get()
         self._state["models"]["temperature"] = float(self.temp_var.get())
         self._state["models"]["max_tokens"] = int(self.max_tokens_var.get())
+        _api_keys.cache_clear()
         messagebox.showinfo("OK", "Configuración guardada correctamente.")
 
     def _build_tab4(self):
@@ -298,7 +619,12 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
         self.progress_bar.pack(fill="x", padx=10, pady=5)
         
-        self.progress_label = ttk.Label(progress_frame, text="Listo para generar")
+        # Fixed width fitting the longest step text, so text updates never
+        # propagate a geometry change up the widget tree
+        font = tkfont.nametofont("TkDefaultFont")
+        widest = max(font.measure(text) for text in _PROGRESS_TEXTS)
+        width = -(-widest // font.measure("0"))
+        self.progress_label = ttk.Label(progress_frame, text="Listo para generar", width=width, anchor="center")
         self.progress_label.pack(padx=10, pady=2)
         
         # Chunk processing info
@@ -318,6 +644,7 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         
         self.log.pack(side="left", fill="both", expand=True, padx=10, pady=5)
         log_scrollbar.pack(side="right", fill="y", pady=5)
+        self._flush_log_buffer()  # Entries logged before this tab existed
         
         # Buttons
         btns = ttk.Frame(frm); btns.pack(fill="x", pady=5)
@@ -345,16 +672,25 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
             sonnet_chunks = len(chunks.get("sonnet", []))
             self.chunk_status.config(text=f"DeepSeek: {deepseek_chunks} chunks | Sonnet: {sonnet_chunks} chunks")
         
-        # Start generation in separate thread
-        def generate():
-            try:
-                self._generate_proposal()
-            except Exception as e:
-                self.master.after(0, self._append_log, f"❌ Error inesperado: {str(e)}")
-            finally:
-                self.master.after(0, self._generation_complete)
-        
-        threading.Thread(target=generate, daemon=True).start()
+        # Run generation as a task on the background event loop; each run gets its
+        # own cancel event so an aborted run cannot be revived by the next one
+        self._generation_id += 1
+        self._cancel_event = threading.Event()
+        # The run works on a snapshot: "Guardar datos" edits the project dict in place
+        project = dict(self._state["project"])
+        self._current_future = asyncio.run_coroutine_threadsafe(
+            self._run_generation(self._generation_id, project, self._cancel_event), _background_loop()
+        )
+
+    async def _run_generation(self, generation_id, project, cancel_event):
+        try:
+            await self._generate_proposal(project, cancel_event)
+        except GenerationAborted:
+            pass  # Already reported by _on_abort
+        except Exception as e:
+            self._post_log(f"❌ Error inesperado: {str(e)}")
+        finally:
+            self._post_ui(self._generation_complete, generation_id)
 
     def _validate_inputs(self):
         self._append_log("🔍 Validando entradas...")
@@ -369,7 +705,7 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
             messagebox.showerror("Error", "Falta procesar los Términos de Referencia")
             return False
             
-        if not os.getenv("DEEPSEEK_API_KEY") and not os.getenv("SONNET_API_KEY"):
+        if not any(_api_keys()):
             self._append_log("❌ Error: no hay APIs configuradas. Revisa tu archivo .env")
             messagebox.showerror("Error", "No hay APIs configuradas")
             return False
@@ -377,77 +713,70 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         self._append_log("✅ Validación exitosa")
         return True
 
-    def _generate_proposal(self):
-        self.master.after(0, self._update_progress, 0, "🚀 Iniciando generación...")
+    @staticmethod
+    def _check_cancelled(cancel_event):
+        if cancel_event.is_set():
+            raise GenerationAborted("Generación abortada por el usuario")
+
+    async def _generate_proposal(self, project, cancel_event):
+        self._report_progress(0, "🚀 Iniciando generación...")
         
         # Create output directory
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         run_dir = Path("runs") / f"run_{timestamp}"
         run_dir.mkdir(parents=True, exist_ok=True)
         
-        self.master.after(0, self._append_log, f"📁 Directorio de salida: {run_dir}")
+        self._post_log(f"📁 Directorio de salida: {run_dir}")
         
-        # Step 1: Generate narrative using DeepSeek with token management
-        self.master.after(0, self._update_progress, 20, "📝 Generando narrativa...")
-        narrative = self._generate_narrative_with_chunking()
+        # Steps 1-2: narrative (DeepSeek) and budget (Sonnet) are independent,
+        # so both providers are called concurrently
+        self._report_progress(20, "📝 Generando narrativa y presupuesto...")
+        narrative, budget = await self._generate_async(project, cancel_event)
+        self._check_cancelled(cancel_event)
+        self._report_progress(70, "📊 Procesando resultados...")
         
         if narrative and not narrative.startswith("Error"):
             self._state["results"]["narrative"] = narrative
-            self.master.after(0, self._append_log, "✅ Narrativa generada exitosamente")
+            self._post_log("✅ Narrativa generada exitosamente")
         else:
-            self.master.after(0, self._append_log, f"❌ Error en narrativa: {narrative}")
-        
-        # Step 2: Generate budget using Sonnet with token management
-        self.master.after(0, self._update_progress, 50, "💰 Generando presupuesto...")
-        budget = self._generate_budget_with_chunking()
+            self._post_log(f"❌ Error en narrativa: {narrative}")
         
         if budget and not budget.get("error"):
             self._state["results"]["budget"] = budget
             total = budget.get("total", 0)
-            self.master.after(0, self._append_log, f"✅ Presupuesto generado exitosamente (Total: ${total:,.2f})")
+            self._post_log(f"✅ Presupuesto generado exitosamente (Total: ${total:,.2f})")
         else:
             error_msg = budget.get("error", "Error desconocido") if budget else "No se generó presupuesto"
-            self.master.after(0, self._append_log, f"❌ Error en presupuesto: {error_msg}")
+            self._post_log(f"❌ Error en presupuesto: {error_msg}")
         
         # Step 3: Generate documents
-        self.master.after(0, self._update_progress, 80, "📄 Generando documentos...")
+        self._report_progress(80, "📄 Generando documentos...")
+        self._check_cancelled(cancel_event)
+        await _run_blocking(self._save_outputs, run_dir, timestamp, project, narrative, budget)
         
-        # Generate DOCX
-        docx_path = run_dir / "propuesta.docx"
-        context = {
-            **self._state["project"],
-            "project_title": self._state["project"].get("title", "Propuesta"),
-            "narrative": narrative if narrative and not narrative.startswith("Error") else "No se pudo generar la narrativa"
-        }
-        
-        if DocumentProcessor.generate_docx_from_template(
-            self._state["templates"].get("docx"), 
-            str(docx_path), 
-            context
-        ):
-            self._state["results"]["output_paths"]["docx"] = str(docx_path)
-            self.master.after(0, self._append_log, f"✅ Documento DOCX generado: {docx_path.name}")
-        else:
-            self.master.after(0, self._append_log, "❌ Error generando documento DOCX")
-        
-        # Generate Excel budget
+        self._report_progress(100, "🎉 ¡Generación completada!")
+        self._post_log("🎉 ¡Propuesta generada exitosamente!")
+
+    def _save_outputs(self, run_dir, timestamp, project, narrative, budget):
+        """Write the DOCX, XLSX and JSON outputs of a run (blocking)"""
+        # The DOCX, XLSX and metadata files are independent, so they are written concurrently
+        writers = [
+            (self._save_docx, run_dir, project, narrative),
+            (self._save_metadata, run_dir, timestamp, project)
+        ]
         if budget and not budget.get("error"):
-            excel_path = run_dir / "presupuesto.xlsx"
-            if DocumentProcessor.generate_excel_budget(str(excel_path), budget):
-                self._state["results"]["output_paths"]["xlsx"] = str(excel_path)
-                self.master.after(0, self._append_log, f"✅ Presupuesto Excel generado: {excel_path.name}")
-            else:
-                self.master.after(0, self._append_log, "❌ Error generando presupuesto Excel")
+            writers.append((self._save_xlsx, run_dir, budget))
+        _fanout(self._io_pool, writers)  # Re-raises any writer error
         
-        # Save raw results
+        # Save raw results (after both writers have recorded their output paths)
         results_path = run_dir / "results.json"
         with open(results_path, 'w', encoding='utf-8') as f:
             json.dump(self._state["results"], f, ensure_ascii=False, indent=2)
-        
-        # Save processing metadata
+
+    def _save_metadata(self, run_dir, timestamp, project):
         metadata = {
             "timestamp": timestamp,
-            "project_info": self._state["project"],
+            "project_info": project,
             "tor_analysis": {
                 "original_size": len(self._state.get("tor_content", "")),
                 "estimated_tokens": TokenManager.estimate_tokens(self._state.get("tor_content", "")),
@@ -462,50 +791,120 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         metadata_path = run_dir / "metadata.json"
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    def _save_docx(self, run_dir, project, narrative):
+        docx_path = run_dir / "propuesta.docx"
+        context = {
+            **project,
+            "project_title": project.get("title", "Propuesta"),
+            "narrative": narrative if narrative and not narrative.startswith("Error") else "No se pudo generar la narrativa"
+        }
         
-        self.master.after(0, self._update_progress, 100, "🎉 ¡Generación completada!")
-        self.master.after(0, self._append_log, "🎉 ¡Propuesta generada exitosamente!")
+        from services.document_processor import DocumentProcessor
+        if DocumentProcessor.generate_docx_from_template(
+            self._state["templates"].get("docx"), 
+            str(docx_path), 
+            context
+        ):
+            self._state["results"]["output_paths"]["docx"] = str(docx_path)
+            self._path_exists_cache.pop(str(docx_path), None)
+            self._state["results"]["output_names"]["docx"] = docx_path.name
+            self._post_log(f"✅ Documento DOCX generado: {docx_path.name}")
+        else:
+            self._post_log("❌ Error generando documento DOCX")
+
+    def _save_xlsx(self, run_dir, budget):
+        excel_path = run_dir / "presupuesto.xlsx"
+        from services.document_processor import DocumentProcessor
+        if DocumentProcessor.generate_excel_budget(str(excel_path), budget):
+            self._state["results"]["output_paths"]["xlsx"] = str(excel_path)
+            self._path_exists_cache.pop(str(excel_path), None)
+            self._state["results"]["output_names"]["xlsx"] = excel_path.name
+            self._post_log(f"✅ Presupuesto Excel generado: {excel_path.name}")
+        else:
+            self._post_log("❌ Error generando presupuesto Excel")
 
-    def _generate_narrative_with_chunking(self):
+    async def _generate_async(self, project, cancel_event):
+        """Generate narrative and budget concurrently, returns (narrative, budget)"""
+        async def run_blocking(func):
+            # The provider clients are synchronous. Requests in flight are bounded
+            # inside services.llm_providers.
+            return await _run_blocking(func, project, cancel_event)
+        
+        narrative_task = run_blocking(self._generate_narrative_with_chunking)
+        budget_task = run_blocking(self._generate_budget_with_chunking)
+        narrative, budget = await asyncio.gather(narrative_task, budget_task)
+        return narrative, budget
+
+    def _generate_narrative_with_chunking(self, project, cancel_event=None):
         """Generate narrative using intelligent chunking and chained prompts"""
         try:
             chunks = self._state.get("tor_chunks", {}).get("deepseek", [])
             if not chunks:
                 return "Error: No hay chunks de DeepSeek disponibles"
             
-            self.master.after(0, self._append_log, f"📝 Procesando narrativa con {len(chunks)} chunk(s)")
+            models = self._state["models"]
             
-            # Create DeepSeek client
+            # Create DeepSeek client (requests is imported on first generation)
+            from services.llm_providers import DeepSeekClient
             client = DeepSeekClient(
-                api_key=os.getenv("DEEPSEEK_API_KEY"),
-                temperature=self._state["models"]["temperature"],
-                max_tokens=self._state["models"]["max_tokens"]
+                api_key=_api_keys()[0],
+                temperature=models["temperature"],
+                max_tokens=models["max_tokens"]
             )
             
+            # Keyed on the model the client calls, so changing it never serves old narratives
+            use_cache = models.get("use_cache", False)
+            cache_key = LLMCache.make_key(
+                "narrative", PROMPT_VERSION, project, chunks,
+                client.model, models["temperature"], models["max_tokens"], models.get("language")
+            )
+            cached = None
+            if use_cache:
+                try:
+                    cached = self._llm_cache.get(cache_key)
+                except (sqlite3.Error, OSError) as e:
+                    # An unusable cache only costs a fresh generation
+                    self._post_log(f"⚠️ Caché de narrativas no disponible: {str(e)}")
+            if cached is not None:
+                self._post_log("📝 Narrativa recuperada de la caché (desactiva la caché en Configuración para regenerarla)")
+                return cached
+            
+            self._post_log(f"📝 Procesando narrativa con {len(chunks)} chunk(s)")
+            
             # Get max tokens for chunking
             max_tokens = TokenManager.get_max_content_tokens("deepseek")
             
             # Use ChainedPromptGenerator
-            generator = ChainedPromptGenerator(client, max_tokens)
-            result = generator.process_tor_chunks(chunks, self._state["project"], "narrative")
+            generator = ChainedPromptGenerator(client, max_tokens, cancel_event)
+            result = generator.process_tor_chunks(chunks, project, "narrative")
             
+            # A narrative built around a failed request may look complete; never keep it
+            if use_cache and result and not result.startswith("Error") and not generator.had_errors:
+                try:
+                    self._llm_cache.set(cache_key, result)
+                except (sqlite3.Error, OSError) as e:
+                    self._post_log(f"⚠️ No se pudo guardar la narrativa en caché: {str(e)}")
             return result
             
+        except GenerationAborted:
+            raise
         except Exception as e:
             return f"Error generando narrativa: {str(e)}"
 
-    def _generate_budget_with_chunking(self):
+    def _generate_budget_with_chunking(self, project, cancel_event=None):
         """Generate budget using intelligent chunking and chained prompts"""
         try:
             chunks = self._state.get("tor_chunks", {}).get("sonnet", [])
             if not chunks:
                 return {"error": "No hay chunks de Sonnet disponibles"}
             
-            self.master.after(0, self._append_log, f"💰 Procesando presupuesto con {len(chunks)} chunk(s)")
+            self._post_log(f"💰 Procesando presupuesto con {len(chunks)} chunk(s)")
             
             # Create Sonnet client
+            from services.llm_providers import SonnetClient
             client = SonnetClient(
-                api_key=os.getenv("SONNET_API_KEY"),
+                api_key=_api_keys()[1],
                 temperature=self._state["models"]["temperature"],
                 max_tokens=self._state["models"]["max_tokens"]
             )
@@ -514,11 +913,13 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
             max_tokens = TokenManager.get_max_content_tokens("sonnet")
             
             # Use ChainedPromptGenerator
-            generator = ChainedPromptGenerator(client, max_tokens)
-            result = generator.process_tor_chunks(chunks, self._state["project"], "budget")
+            generator = ChainedPromptGenerator(client, max_tokens, cancel_event)
+            result = generator.process_tor_chunks(chunks, project, "budget")
             
             return result
             
+        except GenerationAborted:
+            raise
         except Exception as e:
             return {"error": f"Error generando presupuesto: {str(e)}"}
 
@@ -526,7 +927,9 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
         self.progress_bar['value'] = value
         self.progress_label.config(text=text)
 
-    def _generation_complete(self):
+    def _generation_complete(self, generation_id):
+        if generation_id != self._generation_id:
+            return  # An aborted run finishing after a newer one was started
         self._processing = False
         self.generate_btn.config(state="normal")
         self.abort_btn.config(state="disabled")
@@ -535,13 +938,39 @@ Estrategia: Chunking inteligente + prompts encadenados para documentos grandes
     def _on_abort(self):
         if self._processing:
             self._processing = False
+            self._cancel_event.set()
+            if self._current_future:
+                self._current_future.cancel()
             self.generate_btn.config(state="normal")
             self.abort_btn.config(state="disabled")
             self._append_log("🛑 Generación abortada por el usuario")
 
-    def _append_log(self, msg):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log.insert("end", f"[{timestamp}] {msg}\n")
+    def _post_log(self, msg):
+        """Log from a background thread, stamped when the event happened rather than when drained"""
+        self._post_ui(self._append_log, msg, _log_timestamp())
+
+    def _append_log(self, msg, ts=None):
+        self._log_buffer.append(f"[{ts or _log_timestamp()}] {msg}\n")
+        
+        # Entries are written to the widget in batches
+        if not self._log_flush_scheduled:
+            self._log_flush_scheduled = True
+            self.master.after(100, self._flush_log_buffer)
+
+    def _flush_log_buffer(self):
+        self._log_flush_scheduled = False
+        # Kept until the Generación tab (and its log widget) is built
+        if not self._log_buffer or not hasattr(self, "log"):
+            return
+        
+        entries = "".join(self._log_buffer)
+        self._log_buffer.clear()
+        self.log.insert("end", entries)
+        
+        # Drop the oldest entries once over the cap ("end-1c" sits on the empty last line)
+        excess = int(self.log.index("end-1c").split(".")[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            self.log.delete("1.0", f"{excess + 1}.0")
         self.log.see("end")
 
     def _build_tab5(self):
@@ -627,77 +1056,73 @@ Estrategia: {'Prompt único' if len(chunks.get('deepseek', [])) <= 1 else 'Promp
         # Update files list
         self.files_list.delete(0, tk.END)
         output_paths = results.get("output_paths", {})
-        for file_type, path in output_paths.items():
-            if path and os.path.exists(path):
-                filename = Path(path).name
-                self.files_list.insert(tk.END, f"{file_type.upper()}: {filename}")
-        
-        # Update content preview
-        self.results_box.config(state="normal")
-        self.results_box.delete("1.0", "end")
+        # File names are recorded once by the writers; no Path parsing per refresh
+        output_names = results.get("output_names", {})
+        listed = [
+            (file_type, path) for file_type, path in output_paths.items()
+            if path and self._cached_exists(path)
+        ]
+        # Paths are kept in listbox order so a selection maps straight back to its file
+        self._listed_paths = [path for _, path in listed]
+        file_items = [
+            f"{file_type.upper()}: {output_names.get(file_type, os.path.basename(path))}"
+            for file_type, path in listed
+        ]
+        if file_items:
+            self.files_list.insert(tk.END, *file_items)
+        
+        # Update content preview (built up front and applied in one edit)
+        preview_parts = []
         
         if narrative and not narrative.startswith("Error"):
-            self.results_box.insert("end", "=== NARRATIVA ===\n\n")
+            preview_parts.append("=== NARRATIVA ===\n\n")
             preview = narrative[:1500] + "..." if len(narrative) > 1500 else narrative
-            self.results_box.insert("end", preview + "\n\n")
+            preview_parts.append(preview + "\n\n")
         
         if budget and not budget.get("error"):
-            self.results_box.insert("end", "=== RESUMEN PRESUPUESTAL ===\n\n")
-            self.results_box.insert("end", f"Total: ${budget.get('total', 0):,.2f}\n")
-            self.results_box.insert("end", f"Moneda: {budget.get('currency', 'N/A')}\n")
-            self.results_box.insert("end", f"Items: {len(budget.get('items', []))}\n\n")
+            preview_parts.append("=== RESUMEN PRESUPUESTAL ===\n\n")
+            preview_parts.append(f"Total: ${budget.get('total', 0):,.2f}\n")
+            preview_parts.append(f"Moneda: {budget.get('currency', 'N/A')}\n")
+            preview_parts.append(f"Items: {len(budget.get('items', []))}\n\n")
             
             if budget.get('summary_by_category'):
-                self.results_box.insert("end", "Resumen por categoría:\n")
+                preview_parts.append("Resumen por categoría:\n")
                 for category, amount in budget.get('summary_by_category', {}).items():
-                    self.results_box.insert("end", f"  {category}: ${amount:,.2f}\n")
+                    preview_parts.append(f"  {category}: ${amount:,.2f}\n")
         
+        self.results_box.config(state="normal")
+        self.results_box.replace("1.0", "end", "".join(preview_parts))
         self.results_box.config(state="disabled")
 
     def _open_selected_file(self, event):
         selection = self.files_list.curselection()
-        if selection:
-            item = self.files_list.get(selection[0])
-            file_type = item.split(":")[0].lower()
-            output_paths = self._state["results"].get("output_paths", {})
-            
-            if file_type in output_paths:
-                path = output_paths[file_type]
-                if os.path.exists(path):
-                    self._open_file(path)
+        if selection and selection[0] < len(self._listed_paths):
+            path = self._listed_paths[selection[0]]
+            if self._cached_exists(path):
+                self._open_path(path)
+
+    def _cached_exists(self, path):
+        """os.path.exists for output files, re-checked at most every PATH_EXISTS_TTL seconds"""
+        now = time.monotonic()
+        cached = self._path_exists_cache.get(path)
+        if cached and now - cached[0] < PATH_EXISTS_TTL:
+            return cached[1]
+        exists = os.path.exists(path)
+        self._path_exists_cache[path] = (now, exists)
+        return exists
 
-    def _open_file(self, path):
+    def _open_path(self, path, error_msg="No se pudo abrir el archivo"):
         try:
-            import subprocess
-            import platform
-            
-            if platform.system() == "Windows":
-                os.startfile(path)
-            elif platform.system() == "Darwin":  # macOS
-                subprocess.run(["open", path])
-            else:  # Linux
-                subprocess.run(["xdg-open", path])
+            _open_with_system(str(path))
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo abrir el archivo: {str(e)}")
+            messagebox.showerror("Error", f"{error_msg}: {str(e)}")
 
     def _clear_results(self):
         if messagebox.askyesno("Confirmar", "¿Estás seguro de que quieres limpiar los resultados?"):
-            self._state["results"] = {"narrative": None, "budget": None, "output_paths": {}}
+            self._state["results"] = {"narrative": None, "budget": None, "output_paths": {}, "output_names": {}}
             self._update_results_view()
 
     def _open_runs_folder(self):
         runs_path = Path.cwd() / "runs"
         runs_path.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            import subprocess
-            import platform
-            
-            if platform.system() == "Windows":
-                subprocess.run(["explorer", str(runs_path)])
-            elif platform.system() == "Darwin":  # macOS
-                subprocess.run(["open", str(runs_path)])
-            else:  # Linux
-                subprocess.run(["xdg-open", str(runs_path)])
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo abrir la carpeta: {str(e)}")
\ No newline at end of file
+        self._open_path(runs_path, "No se pudo abrir la carpeta")